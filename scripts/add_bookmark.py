@@ -7,57 +7,172 @@ corresponding pages. Also adds bookmarks for all pages.
 """
 
 import argparse
+import itertools
+import operator
+import os
 import re
+import string
 import sys
 from pathlib import Path
 
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    print("Error: PyMuPDF (pymupdf) is required for this script.", file=sys.stderr)
-    print("Please install: pip install pymupdf", file=sys.stderr)
-    sys.exit(1)
+# Per-line parsing diagnostics, enabled with PDF_TOOLKIT_DEBUG=1
+DEBUG = bool(os.environ.get("PDF_TOOLKIT_DEBUG"))
 
+# PyMuPDF is imported by _require_fitz() once arguments are parsed, so that
+# --help and argument errors do not pay for loading it
+fitz = None
 
-def detect_toc_page(doc):
+
+def _require_fitz():
+    """
+    Import PyMuPDF on first use, exiting with an install hint if it is missing.
+    """
+    global fitz
+    if fitz is not None:
+        return
+    try:
+        import fitz as _fitz  # PyMuPDF
+    except ImportError:
+        print("Error: PyMuPDF (pymupdf) is required for this script.", file=sys.stderr)
+        print("Please install: pip install pymupdf", file=sys.stderr)
+        sys.exit(1)
+    fitz = _fitz
+
+
+# Patterns used while scanning TOC pages, compiled once at import time
+_SECTION_START = re.compile(r'^(\d+(?:\.\d+)*)\s+')
+_SECTION_START_TITLE = re.compile(r'^(\d+(?:\.\d+)*)\s+(.+)$')
+_PAGE_END_DOTS = re.compile(r'[.\s]+(\d+)\s*$')
+_PAGE_END = re.compile(r'(\d+)\s*$')
+_SECTION_ONLY = re.compile(r'^(\d+(?:\.\d+)*)\s*$')
+_LEADING_DIGIT = re.compile(r'^\d')
+_SINGLE_DIGIT = re.compile(r'^\d$')
+_NUMBER_ONLY = re.compile(r'^\d+(?:\.\d+)*\s*$')
+_SECTION_DOT = re.compile(r'\d+\.\d+')
+
+# Dot leaders and whitespace trailing a title, stripped with str.rstrip
+_TITLE_TRAILING = '. \t\n\r\f\v\xa0'
+
+# Common page headers/footers filtered out of bookmark titles
+_SKIP_BOOKMARK = re.compile('|'.join(map(re.escape, [
+    'penetration testing with kali linux',
+    'pwk - copyright',
+    'copyright',
+    'table of contents',
+    'contents',
+])))
+
+# Translation table removing dots, e.g. "2.1.3" -> "213"
+_DOT_TRANS = str.maketrans('', '', '.')
+
+# Translation table turning the "start,end" index range separator into '-'
+_RANGE_SEP = str.maketrans(',', '-')
+
+# Translation table removing punctuation for fuzzy text search: ASCII
+# punctuation except '_' (a word character) plus common typographic marks
+_PUNCT_STRIP = str.maketrans('', '', string.punctuation.replace('_', '') + '‘’“”–—…•·©®™')
+
+# Keywords that mark a TOC page. The lookahead reports every keyword present,
+# including "contents" inside "table of contents", in a single scan.
+_TOC_KEYWORDS = re.compile(r'(?=(table of contents|contents|index|table des matières))')
+
+# Obvious non-TOC lines (headers, footers) skipped while extracting entries
+_SKIP_KEYWORDS = re.compile('|'.join(map(re.escape, [
+    'table of contents', 'contents', 'index',
+    'penetration testing with kali linux',
+    'pwk - copyright',
+    'copyright ©',
+    'all rights reserved',
+])))
+
+
+def _text_from_dict(text_dict):
+    """
+    Build plain page text from a get_text("dict") result, one line per text line.
+    """
+    lines = []
+    for block in text_dict.get("blocks", []):
+        if block.get("type") == 0:  # Text block
+            for line in block.get("lines", []):
+                lines.append("".join(span.get("text", "") for span in line.get("spans", [])))
+    return "\n".join(lines)
+
+
+def _get_page_text(page, page_text_cache, text_dict=None):
+    """
+    Return the plain text of a page, extracting it at most once per page.
+    page_text_cache maps page index to text and must belong to the page's document.
+    If text_dict is given, the text is derived from it instead of asking MuPDF again.
+    """
+    page_text = page_text_cache.get(page.number)
+    if page_text is None:
+        if text_dict is not None:
+            page_text = _text_from_dict(text_dict)
+        else:
+            page_text = page.get_text()
+        page_text_cache[page.number] = page_text
+    return page_text
+
+
+def _toc_like_count(text, limit=None):
+    """
+    Count lines ending with a page number, like "Introduction ..... 5".
+    Scans line endings directly instead of running a backtracking regex.
+    If limit is given, stops counting once it is reached.
+    """
+    count = 0
+    for line in text.splitlines():
+        tail = line.rstrip()
+        if tail and tail.rsplit(None, 1)[-1].isdigit():
+            count += 1
+            if count == limit:
+                break
+    return count
+
+
+def _page_is_toc(page_text):
+    """
+    Check whether a page still looks like part of a table of contents.
+    TOC pages typically have entries ending with page numbers.
+    """
+    return _toc_like_count(page_text, limit=2) >= 2
+
+
+def detect_toc_page(doc, page_text_cache=None):
     """
     Detect which page contains the table of contents.
+    page_text_cache: optional per-document dict of page text, shared with later passes
     Returns page number (0-indexed) or None.
     """
-    toc_keywords = [
-        'table of contents',
-        'contents',
-        'index',
-        'table des matières',
-    ]
-    
+    if page_text_cache is None:
+        page_text_cache = {}
     best_match = None
     best_score = 0
     
     for page_num in range(min(20, len(doc))):  # Check first 20 pages
         page = doc[page_num]
-        page_text = page.get_text()
+        page_text = _get_page_text(page, page_text_cache)
         page_text_lower = page_text.lower()
         
         score = 0
         
         # Check for TOC keywords
-        for keyword in toc_keywords:
-            if keyword in page_text_lower:
-                score += 10
+        score += 10 * len(set(_TOC_KEYWORDS.findall(page_text_lower)))
         
         # Check for TOC patterns - lines ending with page numbers
-        # Pattern: text ... number at end of line
-        toc_pattern_matches = len(re.findall(r'.+?\s+\d+\s*$', page_text, re.MULTILINE))
+        toc_pattern_matches = _toc_like_count(page_text)
         if toc_pattern_matches > 3:  # At least 3 TOC-like entries
             score += toc_pattern_matches
         
         # Check for section numbers (e.g., "1.1", "2.3.4")
-        section_pattern_matches = len(re.findall(r'\d+\.\d+', page_text))
+        section_pattern_matches = len(_SECTION_DOT.findall(page_text))
         if section_pattern_matches > 2:
             score += section_pattern_matches
         
+        # A page this TOC-like is good enough, no need to scan further
+        if score >= 50:
+            return page_num
+        
         if score > best_score:
             best_score = score
             best_match = page_num
@@ -69,99 +184,80 @@ def detect_toc_page(doc):
     return None
 
 
-def extract_toc_entries(page):
+def extract_toc_entries(page, text_dict=None):
     """
     Extract TOC entries from a page.
-    Returns list of tuples: (section_num, title, page_number, bbox, full_line_text, level, page_idx)
+    Yields tuples: (section_num, title, page_number, bbox, full_line_text, level, page_idx)
     Handles multi-line TOC entries where section number, title, and page number may be on different lines.
+    text_dict may be passed in if get_text("dict") was already called for this page.
     """
-    toc_entries = []
+    entries_found = 0
     page_idx = page.number
     
     # Get text with positions
-    text_dict = page.get_text("dict")
+    if text_dict is None:
+        text_dict = page.get_text("dict")
     
     # First, collect all lines with their bboxes and y-positions
     all_lines = []
     for block in text_dict.get("blocks", []):
         if block.get("type") == 0:  # Text block
             for line in block.get("lines", []):
-                line_text = ""
-                line_bbox_list = []
-                
-                for span in line.get("spans", []):
-                    line_text += span.get("text", "")
-                    line_bbox_list.append(span.get("bbox", []))
-                
-                line_text = line_text.strip()
+                line_text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
                 
                 if not line_text:
                     continue
                 
-                # Get line bbox
-                line_bbox = line.get("bbox", [])
-                if not line_bbox or len(line_bbox) < 4:
-                    if line_bbox_list:
-                        valid_spans = [span for span in line_bbox_list if span and len(span) >= 4]
-                        if valid_spans:
-                            x0 = min(span[0] for span in valid_spans)
-                            y0 = min(span[1] for span in valid_spans)
-                            x1 = max(span[2] for span in valid_spans)
-                            y1 = max(span[3] for span in valid_spans)
-                            line_bbox = [x0, y0, x1, y1]
-                        else:
-                            line_bbox = []
-                    else:
-                        line_bbox = []
+                # MuPDF reports a bbox for every line, no need to rebuild it from spans
+                line_bbox = line.get("bbox") or (0, 0, 0, 0)
                 
                 # Get y-position for sorting/grouping
-                y_pos = line_bbox[1] if line_bbox else 0
-                all_lines.append((line_text, line_bbox, y_pos))
+                all_lines.append((line_text, line_bbox, line_bbox[1]))
     
     # Sort lines by y-position (top to bottom)
-    all_lines.sort(key=lambda x: x[2])
-    
-    # Skip obvious non-TOC lines
-    skip_keywords = [
-        'table of contents', 'contents', 'index',
-        'penetration testing with kali linux',
-        'pwk - copyright',
-        'copyright ©',
-        'all rights reserved',
-    ]
+    # Lines mostly arrive in reading order already, which Timsort handles in one pass
+    all_lines.sort(key=operator.itemgetter(2))
     
     # Now process lines, combining multi-line entries
+    # A bare section number line that was not followed directly by its title
+    # and page number is remembered for the next line
+    pending_section_num = None
+    num_lines = len(all_lines)
     i = 0
-    while i < len(all_lines):
+    while i < num_lines:
         line_text, line_bbox, y_pos = all_lines[i]
-        line_lower = line_text.lower().strip()
+        prev_section_num = pending_section_num
+        pending_section_num = None
+        # Lines were already stripped when collected above
+        line_len = len(line_text)
+        line_lower = line_text.lower()
         
         # Skip headers
-        if any(keyword in line_lower for keyword in skip_keywords):
+        if _SKIP_KEYWORDS.search(line_lower):
             i += 1
             continue
         
         # Skip very short lines, but keep single-digit section numbers like "1", "2"
-        if len(line_text.strip()) < 1:
+        if line_len < 1:
             i += 1
             continue
         
         # Don't skip lines that are just a single number (might be section number)
-        if len(line_text.strip()) == 1 and re.match(r'^\d$', line_text.strip()):
+        if line_len == 1 and _SINGLE_DIGIT.match(line_text):
             # This might be a section number, process it
             pass
-        elif len(line_text.strip()) < 2:
+        elif line_len < 2:
             i += 1
             continue
         
         # Debug: Print first few lines
-        if page_idx <= 2 and len(toc_entries) < 5:
+        if DEBUG and page_idx <= 2 and entries_found < 5:
             print(f"Debug: Processing line {i}: '{line_text[:100]}'", file=sys.stderr)
         
         # Try to match complete entry on single line first
         # Pattern: section_num + title + dots + page_number
-        section_start = re.match(r'^(\d+(?:\.\d+)*)\s+', line_text)
-        page_end = re.search(r'[.\s]+(\d+)\s*$', line_text)
+        section_start = _SECTION_START.match(line_text)
+        page_end = _PAGE_END_DOTS.search(line_text)
         
         if section_start and page_end:
             # Complete entry on one line
@@ -170,160 +266,166 @@ def extract_toc_entries(page):
             title_start = section_start.end()
             title_end = page_end.start()
             title = line_text[title_start:title_end].strip()
-            title = re.sub(r'[.\s]+$', '', title).strip()
+            title = title.rstrip(_TITLE_TRAILING)
             
-            title_clean = title.replace('.', '').strip()
+            title_clean = title.translate(_DOT_TRANS).strip()
             if (title and len(title_clean) > 0 and 
-                title_clean != section_num.replace('.', '').strip() and
+                title_clean != section_num.translate(_DOT_TRANS) and
                 page_num > 0 and page_num <= 10000):
                 level = section_num.count('.') + 1
-                if page_idx <= 2 and len(toc_entries) < 5:
+                if DEBUG and page_idx <= 2 and entries_found < 5:
                     print(f"Debug: Single-line match: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                toc_entries.append((section_num, title, page_num, line_bbox, line_text, level, page_idx))
+                yield (section_num, title, page_num, line_bbox, line_text, level, page_idx)
+                entries_found += 1
                 i += 1
                 continue
         
         # Try multi-line: section number on this line, title/page on next line(s)
         # Check if this line is just a section number (like "1", "2", "2.1", "2.1.1")
-        section_only_match = re.match(r'^(\d+(?:\.\d+)*)\s*$', line_text)
-        if section_only_match and i + 1 < len(all_lines):
+        section_only_match = _SECTION_ONLY.match(line_text)
+        if section_only_match:
             section_num = section_only_match.group(1)
-            # Look at next line for title and page number
-            next_line_text, next_line_bbox, next_y = all_lines[i + 1]
-            
-            # Check if next line has page number at the end
-            page_end = re.search(r'[.\s]+(\d+)\s*$', next_line_text)
-            if page_end:
-                page_num = int(page_end.group(1))
-                # Title is everything before page number in next line
-                title = next_line_text[:page_end.start()].strip()
-                title = re.sub(r'[.\s]+$', '', title).strip()
+            if i + 1 < num_lines:
+                # Look at next line for title and page number
+                next_line_text, next_line_bbox, next_y = all_lines[i + 1]
                 
-                title_clean = title.replace('.', '').strip()
-                if (title and len(title_clean) > 0 and 
-                    page_num > 0 and page_num <= 10000):
-                    level = section_num.count('.') + 1
-                    combined_text = f"{section_num} {title} {page_num}"
-                    # Use bbox from title line (next line)
-                    if page_idx <= 2 and len(toc_entries) < 5:
-                        print(f"Debug: Multi-line match: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                    toc_entries.append((section_num, title, page_num, next_line_bbox, combined_text, level, page_idx))
-                    i += 2  # Skip both lines
-                    continue
-            # Also check if next line is just title (no page number), then check line after that
-            elif i + 2 < len(all_lines):
-                # Maybe: "1" -> "Copyright" -> "15" (three lines)
-                # Or: "1" -> "Copyright ................ 15" (two lines, but we already checked)
-                # Check if next line is title and line after has page number
-                third_line_text, third_line_bbox, third_y = all_lines[i + 2]
-                page_match = re.search(r'(\d+)\s*$', third_line_text)
-                if page_match and not re.match(r'^\d', next_line_text):
-                    # Next line is title, third line has page number
-                    title = next_line_text.strip()
-                    title = re.sub(r'[.\s]+$', '', title).strip()
-                    page_num = int(page_match.group(1))
+                # Check if next line has page number at the end
+                page_end = _PAGE_END_DOTS.search(next_line_text)
+                if page_end:
+                    page_num = int(page_end.group(1))
+                    # Title is everything before page number in next line
+                    title = next_line_text[:page_end.start()].strip()
+                    title = title.rstrip(_TITLE_TRAILING)
                     
-                    if (title and len(title.replace('.', '').strip()) > 0 and 
+                    title_clean = title.translate(_DOT_TRANS).strip()
+                    if (title and len(title_clean) > 0 and 
                         page_num > 0 and page_num <= 10000):
                         level = section_num.count('.') + 1
                         combined_text = f"{section_num} {title} {page_num}"
-                        if page_idx <= 2 and len(toc_entries) < 5:
-                            print(f"Debug: Multi-line match (3 lines): section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                        toc_entries.append((section_num, title, page_num, next_line_bbox, combined_text, level, page_idx))
-                        i += 3  # Skip all three lines
+                        # Use bbox from title line (next line)
+                        if DEBUG and page_idx <= 2 and entries_found < 5:
+                            print(f"Debug: Multi-line match: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
+                        yield (section_num, title, page_num, next_line_bbox, combined_text, level, page_idx)
+                        entries_found += 1
+                        i += 2  # Skip both lines
                         continue
+                # Also check if next line is just title (no page number), then check line after that
+                elif i + 2 < num_lines:
+                    # Maybe: "1" -> "Copyright" -> "15" (three lines)
+                    # Or: "1" -> "Copyright ................ 15" (two lines, but we already checked)
+                    # Check if next line is title and line after has page number
+                    third_line_text, third_line_bbox, third_y = all_lines[i + 2]
+                    page_match = _PAGE_END.search(third_line_text)
+                    if page_match and not _LEADING_DIGIT.match(next_line_text):
+                        # Next line is title, third line has page number
+                        title = next_line_text.rstrip(_TITLE_TRAILING)
+                        page_num = int(page_match.group(1))
+                        
+                        title_clean = title.translate(_DOT_TRANS).strip()
+                        if (title and len(title_clean) > 0 and 
+                            page_num > 0 and page_num <= 10000):
+                            level = section_num.count('.') + 1
+                            combined_text = f"{section_num} {title} {page_num}"
+                            if DEBUG and page_idx <= 2 and entries_found < 5:
+                                print(f"Debug: Multi-line match (3 lines): section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
+                            yield (section_num, title, page_num, next_line_bbox, combined_text, level, page_idx)
+                            entries_found += 1
+                            i += 3  # Skip all three lines
+                            continue
+            
+            # Title and page number did not follow, keep the section number for the next line
+            pending_section_num = section_num
+            i += 1
+            continue
         
         # Try: section number + partial title on this line, page number on next
-        section_start = re.match(r'^(\d+(?:\.\d+)*)\s+(.+)$', line_text)
-        if section_start and i + 1 < len(all_lines):
+        section_start = _SECTION_START_TITLE.match(line_text)
+        if section_start and i + 1 < num_lines:
             section_num = section_start.group(1)
             partial_title = section_start.group(2).strip()
             next_line_text, next_line_bbox, next_y = all_lines[i + 1]
             
             # Check if next line is just a page number or has page number at end
-            page_match = re.search(r'(\d+)\s*$', next_line_text)
+            page_match = _PAGE_END.search(next_line_text)
             if page_match:
                 page_num = int(page_match.group(1))
                 # Combine titles
                 title = f"{partial_title} {next_line_text[:page_match.start()].strip()}".strip()
-                title = re.sub(r'[.\s]+$', '', title).strip()
+                title = title.rstrip(_TITLE_TRAILING)
                 
-                title_clean = title.replace('.', '').strip()
+                title_clean = title.translate(_DOT_TRANS).strip()
                 if (title and len(title_clean) > 0 and 
-                    title_clean != section_num.replace('.', '').strip() and
+                    title_clean != section_num.translate(_DOT_TRANS) and
                     page_num > 0 and page_num <= 10000):
                     level = section_num.count('.') + 1
                     combined_text = f"{section_num} {title} {page_num}"
-                    if page_idx <= 2 and len(toc_entries) < 5:
+                    if DEBUG and page_idx <= 2 and entries_found < 5:
                         print(f"Debug: Multi-line match (split): section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                    toc_entries.append((section_num, title, page_num, next_line_bbox, combined_text, level, page_idx))
+                    yield (section_num, title, page_num, next_line_bbox, combined_text, level, page_idx)
+                    entries_found += 1
                     i += 2
                     continue
         
         # Try: title on this line with page number, but check if previous line was a section number
         # This handles cases like: "1" (previous line) -> "Copyright ................ 15" (this line)
-        if i > 0:
-            prev_line_text, prev_line_bbox, prev_y = all_lines[i - 1]
-            prev_section_match = re.match(r'^(\d+(?:\.\d+)*)\s*$', prev_line_text)
-            if prev_section_match:
-                # Previous line was a section number, this line might be title + page
-                section_num = prev_section_match.group(1)
-                page_end = re.search(r'[.\s]+(\d+)\s*$', line_text)
-                if page_end:
-                    page_num = int(page_end.group(1))
-                    title = line_text[:page_end.start()].strip()
-                    title = re.sub(r'[.\s]+$', '', title).strip()
+        if prev_section_num:
+            # Previous line was a section number, this line might be title + page
+            section_num = prev_section_num
+            page_end = _PAGE_END_DOTS.search(line_text)
+            if page_end:
+                page_num = int(page_end.group(1))
+                title = line_text[:page_end.start()].strip()
+                title = title.rstrip(_TITLE_TRAILING)
+                
+                title_clean = title.translate(_DOT_TRANS).strip()
+                if (title and len(title_clean) > 0 and 
+                    page_num > 0 and page_num <= 10000):
+                    level = section_num.count('.') + 1
+                    combined_text = f"{section_num} {title} {page_num}"
+                    if DEBUG and page_idx <= 2 and entries_found < 5:
+                        print(f"Debug: Previous-line section match: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
+                    yield (section_num, title, page_num, line_bbox, combined_text, level, page_idx)
+                    entries_found += 1
+                    i += 1
+                    continue
+            # Also check if page number is on the next line
+            elif i + 1 < num_lines:
+                next_line_text, next_line_bbox, next_y = all_lines[i + 1]
+                page_match = _PAGE_END.search(next_line_text)
+                if page_match and len(next_line_text) <= 3:  # Next line is likely just a page number
+                    page_num = int(page_match.group(1))
+                    title = line_text.rstrip(_TITLE_TRAILING)
                     
-                    title_clean = title.replace('.', '').strip()
+                    title_clean = title.translate(_DOT_TRANS).strip()
                     if (title and len(title_clean) > 0 and 
                         page_num > 0 and page_num <= 10000):
                         level = section_num.count('.') + 1
                         combined_text = f"{section_num} {title} {page_num}"
-                        if page_idx <= 2 and len(toc_entries) < 5:
-                            print(f"Debug: Previous-line section match: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                        toc_entries.append((section_num, title, page_num, line_bbox, combined_text, level, page_idx))
-                        i += 1
+                        if DEBUG and page_idx <= 2 and entries_found < 5:
+                            print(f"Debug: Previous-line section + next-line page: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
+                        yield (section_num, title, page_num, line_bbox, combined_text, level, page_idx)
+                        entries_found += 1
+                        i += 2  # Skip this line and next line
                         continue
-                # Also check if page number is on the next line
-                elif i + 1 < len(all_lines):
-                    next_line_text, next_line_bbox, next_y = all_lines[i + 1]
-                    page_match = re.search(r'(\d+)\s*$', next_line_text)
-                    if page_match and len(next_line_text.strip()) <= 3:  # Next line is likely just a page number
-                        page_num = int(page_match.group(1))
-                        title = line_text.strip()
-                        title = re.sub(r'[.\s]+$', '', title).strip()
-                        
-                        if (title and len(title.replace('.', '').strip()) > 0 and 
-                            page_num > 0 and page_num <= 10000):
-                            level = section_num.count('.') + 1
-                            combined_text = f"{section_num} {title} {page_num}"
-                            if page_idx <= 2 and len(toc_entries) < 5:
-                                print(f"Debug: Previous-line section + next-line page: section='{section_num}', title='{title[:50]}', page={page_num}", file=sys.stderr)
-                            toc_entries.append((section_num, title, page_num, line_bbox, combined_text, level, page_idx))
-                            i += 2  # Skip this line and next line
-                            continue
         
         # Try: title on this line, page number on next (no section number visible)
         # This is a fallback for entries without section numbers
-        page_end = re.search(r'[.\s]+(\d+)\s*$', line_text)
-        if not page_end and i + 1 < len(all_lines):
+        page_end = _PAGE_END_DOTS.search(line_text)
+        if not page_end and i + 1 < num_lines:
             next_line_text, next_line_bbox, next_y = all_lines[i + 1]
-            page_match = re.search(r'(\d+)\s*$', next_line_text)
-            if page_match and not re.match(r'^\d', line_text):
+            page_match = _PAGE_END.search(next_line_text)
+            if page_match and not _LEADING_DIGIT.match(line_text):
                 # This might be a title without section number
-                title = line_text.strip()
-                title = re.sub(r'[.\s]+$', '', title).strip()
+                title = line_text.rstrip(_TITLE_TRAILING)
                 page_num = int(page_match.group(1))
                 
                 if (len(title) > 3 and page_num > 0 and page_num <= 10000 and
-                    not re.match(r'^\d+(?:\.\d+)*\s*$', title)):
+                    not _NUMBER_ONLY.match(title)):
                     # Only add if we really can't find a section number
                     # Skip for now - we want entries with section numbers
                     pass
         
         i += 1
-    
-    return toc_entries
 
 
 def find_text_on_page(page, search_text, fuzzy=True):
@@ -341,7 +443,7 @@ def find_text_on_page(page, search_text, fuzzy=True):
         if fuzzy:
             # Try with variations
             # Remove special characters
-            clean_text = re.sub(r'[^\w\s]', '', search_text)
+            clean_text = search_text.translate(_PUNCT_STRIP)
             if clean_text != search_text:
                 rects = page.search_for(clean_text)
                 if rects:
@@ -369,6 +471,21 @@ def add_toc_hyperlinks(doc, toc_entries, toc_page_idx):
     return 0
 
 
+def _toc_sort_key(entry):
+    """
+    Sort key for TOC entries: page number first, then section number.
+    sorted() computes it once per entry, so the section tuple is built only once.
+    Section numbers are captured by the digits-and-dots TOC patterns, so every
+    part converts to int.
+    """
+    page_num = entry[2]
+    section_num = entry[0]
+    # Convert section number to tuple for proper sorting (e.g., "2.1.3" -> (2, 1, 3))
+    if section_num:
+        return (page_num, tuple(int(x) for x in section_num.split('.')))
+    return (page_num, (0,))
+
+
 def add_toc_bookmarks(doc, toc_entries):
     """
     Add bookmarks from TOC entries.
@@ -379,58 +496,30 @@ def add_toc_bookmarks(doc, toc_entries):
         # Build new TOC list from TOC entries
         new_toc = []
         
-        # Common page headers/footers to filter out
-        skip_patterns = [
-            'penetration testing with kali linux',
-            'pwk - copyright',
-            'copyright',
-            'table of contents',
-            'contents',
-        ]
+        page_count = len(doc)
         
         # Sort entries by page number first, then by section number to maintain proper order
-        def sort_key(entry):
-            if len(entry) >= 3:
-                page_num = entry[2]
-                section_num = entry[0] if len(entry) >= 1 else ""
-                # Convert section number to tuple for proper sorting (e.g., "2.1.3" -> (2, 1, 3))
-                if section_num:
-                    try:
-                        section_parts = tuple(int(x) for x in section_num.split('.'))
-                        return (page_num, section_parts)
-                    except:
-                        return (page_num, (0,))
-                return (page_num, (0,))
-            return (0, (0,))
-        
-        sorted_entries = sorted(toc_entries, key=sort_key)
+        sorted_entries = sorted(toc_entries, key=_toc_sort_key)
         
         # Debug: Check what we're getting
         print(f"Total entries to process: {len(sorted_entries)}", file=sys.stderr)
-        entries_with_section = sum(1 for e in sorted_entries if len(e) >= 1 and e[0] and e[0].strip())
+        entries_with_section = sum(1 for e in sorted_entries if e[0] and e[0].strip())
         entries_without_section = len(sorted_entries) - entries_with_section
         print(f"Entries with section numbers: {entries_with_section}, without: {entries_without_section}", file=sys.stderr)
         
         if len(sorted_entries) > 0:
             print(f"First 5 entries:", file=sys.stderr)
             for i, entry in enumerate(sorted_entries[:5]):
-                if len(entry) >= 6:
-                    section = entry[0] if entry[0] else "(empty)"
-                    title_preview = entry[1][:60] if entry[1] else "(empty)"
-                    print(f"  Entry {i}: section='{section}', title='{title_preview}...', page={entry[2]}, level={entry[5]}", file=sys.stderr)
+                section = entry[0] if entry[0] else "(empty)"
+                title_preview = entry[1][:60] if entry[1] else "(empty)"
+                print(f"  Entry {i}: section='{section}', title='{title_preview}...', page={entry[2]}, level={entry[5]}", file=sys.stderr)
         
         for entry in sorted_entries:
-            # Handle both old format (6 items) and new format (7 items)
-            if len(entry) >= 6:
-                section_num = entry[0]
-                title = entry[1]
-                page_num = entry[2]
-                level = entry[5]
-            else:
-                continue
+            # Entries always come from extract_toc_entries as 7-tuples with str titles
+            section_num, title, page_num, _bbox, _text, level, _page_idx = entry
             
-            # Skip entries with empty or invalid titles
-            if not title or not isinstance(title, str):
+            # Skip entries with empty titles
+            if not title:
                 continue
             
             title = title.strip()
@@ -440,14 +529,14 @@ def add_toc_bookmarks(doc, toc_entries):
                 continue
             
             # Skip if title is just a section number (like "10.1" without actual title)
-            if title == section_num or (section_num and title.replace('.', '').strip() == section_num.replace('.', '').strip()):
+            if title == section_num or (section_num and title.translate(_DOT_TRANS).strip() == section_num.translate(_DOT_TRANS).strip()):
                 continue
             
             # Skip if title matches header patterns (but be more specific)
             title_lower = title.lower()
             # Only skip if it's clearly a header/footer, not a TOC entry
             # For example, "1 Copyright" should NOT be skipped, but "Copyright © 2023" should be
-            if any(pattern in title_lower for pattern in skip_patterns):
+            if _SKIP_BOOKMARK.search(title_lower):
                 # Additional check: if it has a section number and page number, it's likely a TOC entry
                 # Don't skip entries that have section numbers (they're real TOC entries)
                 if not section_num or not section_num.strip():
@@ -455,11 +544,11 @@ def add_toc_bookmarks(doc, toc_entries):
                     continue
             
             # Skip entries that are just numbers (likely page numbers or section numbers only)
-            if re.match(r'^\d+(?:\.\d+)*\s*$', title):
+            if _NUMBER_ONLY.match(title):
                 continue
             
             # Ensure we have a valid page number
-            if page_num <= 0 or page_num > len(doc):
+            if page_num <= 0 or page_num > page_count:
                 continue
             
             # Calculate level properly based on section number depth
@@ -479,14 +568,14 @@ def add_toc_bookmarks(doc, toc_entries):
                 # Remove section number from title if it's already there (to avoid duplication)
                 title_without_section = title_clean
                 
-                # Check various formats where section number might already be in title
-                if title_clean.startswith(section_stripped + " "):
-                    title_without_section = title_clean[len(section_stripped) + 1:].strip()
-                elif title_clean.startswith(section_stripped + "."):
-                    title_without_section = title_clean[len(section_stripped) + 1:].strip()
-                elif title_clean == section_stripped:
-                    # Title is just the section number, skip this entry
-                    continue
+                # Check whether the title already starts with "section " or "section."
+                section_len = len(section_stripped)
+                if title_clean[:section_len] == section_stripped:
+                    if len(title_clean) == section_len:
+                        # Title is just the section number, skip this entry
+                        continue
+                    if title_clean[section_len] in ' .':
+                        title_without_section = title_clean[section_len + 1:].strip()
                 
                 # Always format as "section_num title" - ensure section number is included
                 if title_without_section:
@@ -573,6 +662,7 @@ Examples:
     )
     
     args = parser.parse_args()
+    _require_fitz()
     
     # Validate input file
     input_path = Path(args.input)
@@ -594,13 +684,16 @@ Examples:
     try:
         # Open PDF
         doc = fitz.open(input_path)
+        page_count = len(doc)
         
-        if len(doc) == 0:
+        if page_count == 0:
             print("Error: PDF has no pages", file=sys.stderr)
             doc.close()
             sys.exit(1)
         
-        print(f"PDF has {len(doc)} pages", file=sys.stderr)
+        print(f"PDF has {page_count} pages", file=sys.stderr)
+        # Plain text of pages already extracted from this document, by page index
+        page_text_cache = {}
         
         # Parse index range if provided
         toc_start_idx = None
@@ -608,16 +701,8 @@ Examples:
         
         if args.index_range:
             # Parse range: support both "3,14" and "3-14" formats
-            range_str = args.index_range.strip()
-            if ',' in range_str:
-                parts = range_str.split(',')
-            elif '-' in range_str:
-                parts = range_str.split('-')
-            else:
-                print(f"Error: Invalid index range format. Use 'start,end' or 'start-end' (e.g., '3,14' or '3-14')", file=sys.stderr)
-                doc.close()
-                sys.exit(1)
-            
+            # Map ',' to '-' so both separators are handled by a single split
+            parts = args.index_range.strip().translate(_RANGE_SEP).split('-')
             if len(parts) != 2:
                 print(f"Error: Invalid index range format. Use 'start,end' or 'start-end' (e.g., '3,14' or '3-14')", file=sys.stderr)
                 doc.close()
@@ -632,8 +717,8 @@ Examples:
                 toc_end_idx = end_page - 1
                 
                 # Validate range
-                if toc_start_idx < 0 or toc_end_idx >= len(doc):
-                    print(f"Error: Index range {start_page}-{end_page} is out of bounds (PDF has {len(doc)} pages)", file=sys.stderr)
+                if toc_start_idx < 0 or toc_end_idx >= page_count:
+                    print(f"Error: Index range {start_page}-{end_page} is out of bounds (PDF has {page_count} pages)", file=sys.stderr)
                     doc.close()
                     sys.exit(1)
                 
@@ -648,10 +733,15 @@ Examples:
                 doc.close()
                 sys.exit(1)
         
+        # Per-page progress of the TOC scan, written to stderr in one go afterwards
+        scan_log = []
+        # Entries found on each TOC page, flattened once the scan is done
+        per_page_entries = []
+        
         # Detect TOC page(s) - TOC might span multiple pages
         if toc_start_idx is None:
             # Auto-detect TOC
-            toc_page_idx = detect_toc_page(doc)
+            toc_page_idx = detect_toc_page(doc, page_text_cache)
             if toc_page_idx is None:
                 print("Warning: Could not detect table of contents page. Trying first few pages...", file=sys.stderr)
                 # Try first 3 pages
@@ -660,31 +750,35 @@ Examples:
             print(f"Processing table of contents starting from page {toc_page_idx + 1}...", file=sys.stderr)
             
             # Extract TOC entries from multiple pages (TOC often spans 2-5 pages)
-            toc_entries = []
+            # Pages are extracted one at a time: PyMuPDF does not support
+            # multithreading, and each page decides whether to look at the next
             toc_pages = []
             max_toc_pages = 10  # Check up to 10 pages for TOC
             
             for page_offset in range(max_toc_pages):
                 check_page_idx = toc_page_idx + page_offset
-                if check_page_idx >= len(doc):
+                if check_page_idx >= page_count:
                     break
                 
                 page = doc[check_page_idx]
-                page_text = page.get_text()
                 
-                # Check if this page still has TOC content
-                # TOC pages typically have entries ending with page numbers
-                toc_like_entries = len(re.findall(r'.+?\s+\d+\s*$', page_text, re.MULTILINE))
+                # Extract the text layout once and derive the plain text from it,
+                # unless detect_toc_page already extracted this page
+                text_dict = None
+                if check_page_idx not in page_text_cache:
+                    text_dict = page.get_text("dict")
+                page_text = _get_page_text(page, page_text_cache, text_dict)
                 
-                if toc_like_entries < 2 and page_offset > 0:
+                # Check if this page still has TOC content
+                if page_offset > 0 and not _page_is_toc(page_text):
                     # Not enough TOC-like entries, probably end of TOC
                     break
                 
-                page_entries = extract_toc_entries(page)
+                page_entries = list(extract_toc_entries(page, text_dict))
                 if page_entries:
-                    toc_entries.extend(page_entries)
+                    per_page_entries.append(page_entries)
                     toc_pages.append(check_page_idx)
-                    print(f"Found {len(page_entries)} TOC entries on page {check_page_idx + 1}", file=sys.stderr)
+                    scan_log.append(f"Found {len(page_entries)} TOC entries on page {check_page_idx + 1}")
                 elif page_offset == 0:
                     # First page should have entries, if not try next page
                     continue
@@ -694,19 +788,23 @@ Examples:
         else:
             # Use specified range
             print(f"Processing table of contents from pages {toc_start_idx + 1} to {toc_end_idx + 1}...", file=sys.stderr)
-            toc_entries = []
             toc_pages = []
             
             for check_page_idx in range(toc_start_idx, toc_end_idx + 1):
-                if check_page_idx >= len(doc):
+                if check_page_idx >= page_count:
                     break
                 
                 page = doc[check_page_idx]
-                page_entries = extract_toc_entries(page)
+                page_entries = list(extract_toc_entries(page))
                 if page_entries:
-                    toc_entries.extend(page_entries)
+                    per_page_entries.append(page_entries)
                     toc_pages.append(check_page_idx)
-                    print(f"Found {len(page_entries)} TOC entries on page {check_page_idx + 1}", file=sys.stderr)
+                    scan_log.append(f"Found {len(page_entries)} TOC entries on page {check_page_idx + 1}")
+        
+        if scan_log:
+            sys.stderr.write("\n".join(scan_log) + "\n")
+        
+        toc_entries = list(itertools.chain.from_iterable(per_page_entries))
         
         if not toc_entries:
             print("Error: Could not extract table of contents entries.", file=sys.stderr)
@@ -715,8 +813,10 @@ Examples:
             sys.exit(1)
         
         print(f"Found {len(toc_entries)} TOC entries", file=sys.stderr)
-        if len(toc_entries) <= 10:
-            for section_num, title, page_num, _, _, level in toc_entries:
+        # Short preview for interactive use only, skipped when stderr is redirected
+        if sys.stderr.isatty() and len(toc_entries) <= 10:
+            preview_fields = operator.itemgetter(0, 1, 2, 5)
+            for section_num, title, page_num, level in map(preview_fields, toc_entries):
                 if section_num:
                     print(f"  - {section_num} {title} -> Page {page_num} (level {level})", file=sys.stderr)
         
@@ -738,7 +838,11 @@ Examples:
         print(f"Added {bookmarks_added} bookmarks", file=sys.stderr)
         
         # Save the modified PDF
-        doc.save(output_path)
+        if output_path.resolve() == input_path.resolve() and doc.can_save_incrementally():
+            # Only the outline changed, so append it instead of rewriting the file
+            doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        else:
+            doc.save(output_path, garbage=4, deflate=True, clean=True)
         doc.close()
         
         print(f"Successfully processed PDF. Output saved to: {output_path}", file=sys.stderr)
@@ -6,6 +6,7 @@ Extracts a range of pages from a PDF file and saves them to a new PDF.
 """
 
 import argparse
+import re
 import sys
 from pathlib import Path
 
@@ -18,6 +19,10 @@ except ImportError:
     sys.exit(1)
 
 
+# Page range argument: "start,end" or "start-end"
+_PAGE_RANGE = re.compile(r'^\s*(\d+)\s*[,\-]\s*(\d+)\s*$')
+
+
 def extract_pages(input_path, output_path, start_page, end_page):
     """
     Extract pages from start_page to end_page (1-indexed, inclusive) from input PDF.
@@ -25,8 +30,9 @@ def extract_pages(input_path, output_path, start_page, end_page):
     try:
         # Open input PDF
         doc = fitz.open(input_path)
+        page_count = len(doc)
         
-        if len(doc) == 0:
+        if page_count == 0:
             print("Error: Input PDF has no pages", file=sys.stderr)
             doc.close()
             sys.exit(1)
@@ -35,8 +41,8 @@ def extract_pages(input_path, output_path, start_page, end_page):
         start_idx = start_page - 1
         end_idx = end_page - 1
         
-        if start_idx < 0 or end_idx >= len(doc):
-            print(f"Error: Page range {start_page}-{end_page} is out of bounds (PDF has {len(doc)} pages)", file=sys.stderr)
+        if start_idx < 0 or end_idx >= page_count:
+            print(f"Error: Page range {start_page}-{end_page} is out of bounds (PDF has {page_count} pages)", file=sys.stderr)
             doc.close()
             sys.exit(1)
         
@@ -46,12 +52,13 @@ def extract_pages(input_path, output_path, start_page, end_page):
             sys.exit(1)
         
         # Extract pages (end_idx is inclusive in PyMuPDF)
+        # insert_pdf copies the whole range in one call, no per-page loop needed
         print(f"Extracting pages {start_page} to {end_page} (inclusive)...", file=sys.stderr)
         new_doc = fitz.open()
-        new_doc.insert_pdf(doc, from_page=start_idx, to_page=end_idx)
+        new_doc.insert_pdf(doc, from_page=start_idx, to_page=end_idx, links=True, annots=True)
         
-        # Save output PDF
-        new_doc.save(output_path)
+        # Save output PDF, dropping unused objects and compressing streams in the same pass
+        new_doc.save(output_path, garbage=4, deflate=True, clean=True)
         new_doc.close()
         doc.close()
         
@@ -99,42 +106,34 @@ Examples:
     
     # Validate input file
     input_path = Path(args.input)
-    if not input_path.exists():
+    try:
+        input_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
         print(f"Error: Input file not found: {input_path}", file=sys.stderr)
         sys.exit(1)
+    except OSError as e:
+        print(f"Error: Cannot access input file {input_path}: {e.strerror}", file=sys.stderr)
+        sys.exit(1)
     
     if not input_path.suffix.lower() == '.pdf':
         print(f"Error: Input file must be a PDF: {input_path}", file=sys.stderr)
         sys.exit(1)
     
     # Parse page range
-    range_str = args.page_range.strip()
-    if ',' in range_str:
-        parts = range_str.split(',')
-    elif '-' in range_str:
-        parts = range_str.split('-')
-    else:
-        print(f"Error: Invalid page range format. Use 'start,end' or 'start-end' (e.g., '286,314' or '286-314')", file=sys.stderr)
+    range_match = _PAGE_RANGE.match(args.page_range)
+    if not range_match:
+        print(f"Error: Invalid page range format. Use 'start,end' or 'start-end' with integers (e.g., '286,314' or '286-314')", file=sys.stderr)
         sys.exit(1)
     
-    if len(parts) != 2:
-        print(f"Error: Invalid page range format. Use 'start,end' or 'start-end' (e.g., '286,314' or '286-314')", file=sys.stderr)
+    start_page = int(range_match.group(1))
+    end_page = int(range_match.group(2))
+    
+    if start_page < 1:
+        print(f"Error: Start page must be >= 1", file=sys.stderr)
         sys.exit(1)
     
-    try:
-        start_page = int(parts[0].strip())
-        end_page = int(parts[1].strip())
-        
-        if start_page < 1:
-            print(f"Error: Start page must be >= 1", file=sys.stderr)
-            sys.exit(1)
-        
-        if end_page < start_page:
-            print(f"Error: End page ({end_page}) must be >= start page ({start_page})", file=sys.stderr)
-            sys.exit(1)
-        
-    except ValueError:
-        print(f"Error: Invalid page numbers in range. Use integers (e.g., '286,314')", file=sys.stderr)
+    if end_page < start_page:
+        print(f"Error: End page ({end_page}) must be >= start page ({start_page})", file=sys.stderr)
         sys.exit(1)
     
     # Determine output path
@@ -7,258 +7,420 @@ a specific string pattern.
 """
 
 import argparse
+import collections
+import contextlib
+import functools
+import io
+import itertools
+import math
 import os
+import re
 import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Try PyMuPDF first (better for watermark removal), fallback to pypdf/pdfplumber
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
+# PyMuPDF is imported on a background thread started by main() once arguments are
+# parsed, so the import overlaps input validation and reading the file
+fitz = None
+_fitz_loader = None
+
+
+def _load_fitz():
+    """
+    Import PyMuPDF into the module-level name, leaving it None if it is missing.
+    """
+    global fitz
     try:
-        from pypdf import PdfReader, PdfWriter
-        import pdfplumber
+        import fitz as _fitz  # PyMuPDF
     except ImportError:
-        print("Error: Required packages not installed.", file=sys.stderr)
-        print("Please install one of:", file=sys.stderr)
-        print("  pip install pymupdf  (recommended)", file=sys.stderr)
-        print("  OR", file=sys.stderr)
-        print("  pip install pypdf pdfplumber", file=sys.stderr)
+        return
+    fitz = _fitz
+
+
+def _start_fitz_import():
+    """
+    Start importing PyMuPDF in the background.
+    """
+    global _fitz_loader
+    _fitz_loader = threading.Thread(target=_load_fitz, daemon=True)
+    _fitz_loader.start()
+
+
+def _require_fitz():
+    """
+    Wait for the background PyMuPDF import (or import it now), exiting with an install hint if it is missing.
+    """
+    if _fitz_loader is not None:
+        _fitz_loader.join()
+    if fitz is None:
+        _load_fitz()
+    if fitz is None:
+        print("Error: PyMuPDF (pymupdf) is required for this script.", file=sys.stderr)
+        print("Please install: pip install pymupdf", file=sys.stderr)
         sys.exit(1)
 
 
-def detect_watermark_text(pdf_path, sample_pages=3):
+# Content stream patterns, compiled once at import time.
+# Content streams are 8-bit data, so they are matched as bytes without decoding.
+# One alternation covers BT...ET blocks (group 1), (text) Tj / ' / " (group 2)
+# and [array] TJ (group 3), so a stream is rewritten in a single pass.
+_TEXT_OPERATORS = re.compile(
+    rb'BT(.*?)ET'
+    rb'|\(([^)]*)\)\s+(?:Tj|\'|")\b'
+    rb'|\[([^\]]*)\]\s+TJ\b',
+    re.DOTALL)
+_HEX_STRING = re.compile(rb'<([0-9A-Fa-f]+)>')
+_LITERAL_STRING = re.compile(rb'\(((?:\\.|[^\\()])*)\)', re.DOTALL)
+# Literal string escapes: octal codes, a backslash-EOL line continuation, or one escaped character
+_LITERAL_ESCAPE = re.compile(rb'\\([0-7]{1,3}|\r\n|[\r\n]|.)', re.DOTALL)
+_LITERAL_ESCAPE_CHARS = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+_DO_OPERATOR = re.compile(rb'/(\w+)\s+Do\b')
+
+# Below this many pages to rewrite, process start-up costs more than the pool saves
+_PARALLEL_MIN_PAGES = 50
+
+# The verification pass stops after reporting this many pages that still show a watermark
+_VERIFY_MAX_HITS = 5
+
+# Process pools for rewrite_content_streams by worker count, see _get_rewrite_pool()
+_rewrite_pools = {}
+
+# Per-page removal diagnostics, enabled with PDF_TOOLKIT_DEBUG=1
+DEBUG = bool(os.environ.get("PDF_TOOLKIT_DEBUG"))
+
+
+def build_watermark_matcher(watermark_lowers):
+    """
+    Build a single compiled pattern matching any of the lowercased watermark strings,
+    so each membership test is one scan instead of one scan per watermark.
+    Accepts str (for extracted text) or bytes (for raw content streams).
+    Longer strings come first, so a match reports the whole watermark rather than
+    a shorter watermark it contains.
+    """
+    separator = b'|' if isinstance(watermark_lowers[0], bytes) else '|'
+    ordered = sorted(set(watermark_lowers), key=len, reverse=True)
+    return re.compile(separator.join(re.escape(wm_lower) for wm_lower in ordered))
+
+
+def encode_watermark(wm_lower):
+    """
+    Encode a watermark string the way it would appear in a content stream:
+    latin-1 for simple fonts, utf-8 for anything latin-1 cannot represent.
+    """
+    try:
+        return wm_lower.encode('latin-1').lower()
+    except UnicodeEncodeError:
+        return wm_lower.encode('utf-8').lower()
+
+
+def build_watermark_matchers(watermark_strings):
+    """
+    Build the (text_matcher, stream_matcher) pair for a list of watermark strings:
+    one pattern for extracted page text and one for raw content stream bytes.
+    """
+    watermark_lowers = [w.lower() for w in watermark_strings]
+    return (build_watermark_matcher(watermark_lowers),
+            build_watermark_matcher([encode_watermark(w) for w in watermark_lowers]))
+
+
+def _fadvise(fd, advice):
+    """Best-effort posix_fadvise over the whole file; ignored where unsupported or not applicable (pipes)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except OSError:
+        pass
+
+
+def read_pdf_bytes(path):
+    """
+    Read the whole input PDF in one sequential pass.
+    Everything downstream works from the returned bytes, so the file's
+    page-cache pages are released as soon as the read finishes.
+    """
+    with open(path, 'rb') as f:
+        _fadvise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+        data = f.read()
+        _fadvise(f.fileno(), 'POSIX_FADV_DONTNEED')
+    return data
+
+
+def write_atomically(output_path, write):
+    """
+    Call write(tmp_path) on a temporary file next to output_path, then rename it into place,
+    so a failed run never leaves a partial PDF at output_path.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=Path(output_path).parent, suffix='.pdf.tmp')
+    os.close(fd)
+    try:
+        # mkstemp creates the file 0600; give the output the permissions a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        write(tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def detect_watermark_text(pdf_bytes, sample_pages=3):
     """
     Auto-detect watermark text by finding text that appears on multiple pages.
+    pdf_bytes: raw contents of the input PDF
     Returns the most common watermark text or None.
     """
-    if PYMUPDF_AVAILABLE:
-        try:
-            doc = fitz.open(pdf_path)
-            if len(doc) == 0:
-                doc.close()
-                return None
-            
-            pages_to_check = min(sample_pages, len(doc))
-            text_frequency = {}
-            
-            for page_num in range(pages_to_check):
-                page = doc[page_num]
-                text_dict = page.get_text("dict")
-                
-                # Extract text blocks
-                for block in text_dict.get("blocks", []):
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            line_text = ""
-                            for span in line.get("spans", []):
-                                line_text += span.get("text", "")
-                            line_text = line_text.strip()
-                            if len(line_text) > 3:
-                                text_frequency[line_text] = text_frequency.get(line_text, 0) + 1
-            
+    _require_fitz()
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        if len(doc) == 0:
             doc.close()
-            
-            if text_frequency:
-                most_common = max(text_frequency.items(), key=lambda x: x[1])
-                if most_common[1] >= pages_to_check * 0.7:
-                    return most_common[0]
-            
-            return None
-        except Exception as e:
-            print(f"Warning: Could not auto-detect watermark: {e}", file=sys.stderr)
             return None
-    else:
+        
+        pages_to_check = min(sample_pages, len(doc))
+        # A line seen this many times is the watermark; stop scanning as soon as one gets there
+        threshold = math.ceil(pages_to_check * 0.7)
+        text_frequency = collections.Counter()
+        
+        for page_num in range(pages_to_check):
+            page = doc[page_num]
+            text_dict = page.get_text("dict")
+            
+            # Extract text blocks
+            for block in text_dict.get("blocks", []):
+                if "lines" in block:
+                    for line in block["lines"]:
+                        line_text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+                        if len(line_text) > 3:
+                            text_frequency[line_text] += 1
+                            if text_frequency[line_text] >= threshold:
+                                doc.close()
+                                return line_text
+        
+        doc.close()
+        return None
+    except Exception as e:
+        print(f"Warning: Could not auto-detect watermark: {e}", file=sys.stderr)
+        return None
+
+
+def _decode_literal_escape(match):
+    escape = match.group(1)
+    if escape[:1].isdigit():
+        return bytes((int(escape, 8) & 0xFF,))
+    if escape in (b'\r\n', b'\r', b'\n'):
+        # Backslash before an end-of-line continues the string on the next line
+        return b''
+    # \( \) \\ stand for themselves, and the backslash of an unknown escape is ignored
+    return _LITERAL_ESCAPE_CHARS.get(escape, escape)
+
+
+def decode_literal_string(literal):
+    """
+    Decode the body of a PDF literal string, (...) without the parentheses,
+    the way a PDF reader does: octal codes, \\n \\r \\t \\b \\f, \\( \\) \\\\
+    and backslash-EOL line continuations.
+    """
+    if b'\\' not in literal:
+        return literal
+    return _LITERAL_ESCAPE.sub(_decode_literal_escape, literal)
+
+
+def extract_all_text_from_stream(stream):
+    """Extract all readable text from PDF content stream"""
+    all_text = []
+    
+    # Extract literal strings: (text), decoded the way a PDF reader would see them
+    for literal in _LITERAL_STRING.findall(stream):
+        all_text.append(decode_literal_string(literal))
+    
+    # Extract hex strings: <hex>
+    hex_matches = _HEX_STRING.findall(stream)
+    for hex_str in hex_matches:
+        if len(hex_str) % 2 == 0:
+            all_text.append(bytes.fromhex(hex_str.decode('ascii')))
+    
+    return b' '.join(all_text).lower()
+
+
+def rewrite_content_stream(stream, stream_matcher):
+    """
+    Remove text objects and text-showing operators whose strings match stream_matcher.
+    Works on raw content stream bytes only, so it can run in a worker process.
+    Returns the input object unchanged when nothing matched.
+    """
+    # Text-showing operators are only valid inside BT...ET
+    if b'BT' not in stream:
+        return stream
+    
+    def should_remove(match):
+        text_object, inline_text, array_content = match.groups()
+        if text_object is not None:
+            # Remove any text object containing watermark
+            extracted = extract_all_text_from_stream(text_object)
+        elif inline_text is not None:
+            extracted = decode_literal_string(inline_text).lower()
+        else:
+            extracted = extract_all_text_from_stream(array_content)
+        return stream_matcher.search(extracted) is not None
+    
+    removed_spans = [match.span() for match in _TEXT_OPERATORS.finditer(stream) if should_remove(match)]
+    if not removed_spans:
+        return stream
+    
+    # Join the kept slices straight from the input buffer into one output allocation
+    view = memoryview(stream)
+    kept = []
+    last_end = 0
+    for start, end in removed_spans:
+        kept.append(view[last_end:start])
+        last_end = end
+    kept.append(view[last_end:])
+    return b''.join(kept)
+
+
+def default_jobs():
+    """
+    Default worker count for the content stream rewrite: up to 4 processes.
+    """
+    return min(os.cpu_count() or 1, 4)
+
+
+def _get_rewrite_pool(max_workers):
+    """
+    Return the process pool for content stream rewrites, creating it on first use.
+    The pool lives for the whole process so --stdin-list batches start their workers once.
+    """
+    executor = _rewrite_pools.get(max_workers)
+    if executor is None:
+        executor = _rewrite_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+    return executor
+
+
+def rewrite_content_streams(streams, stream_matcher, max_workers):
+    """
+    Rewrite a batch of page content streams, using a process pool for large batches.
+    Only bytes cross the process boundary; PyMuPDF objects stay in the parent.
+    """
+    if max_workers < 2 or len(streams) < _PARALLEL_MIN_PAGES:
+        return [rewrite_content_stream(stream, stream_matcher) for stream in streams]
+    
+    chunksize = max(1, len(streams) // (max_workers * 4))
+    executor = _get_rewrite_pool(max_workers)
+    return list(executor.map(rewrite_content_stream, streams, itertools.repeat(stream_matcher),
+                             chunksize=chunksize))
+
+
+def collect_form_xrefs(doc):
+    """
+    List the xref of every form XObject in the document,
+    reading each xref's /Subtype once for the whole document.
+    """
+    form_xrefs = []
+    for xref_num in range(1, doc.xref_length()):
         try:
-            import pdfplumber
-            with pdfplumber.open(pdf_path) as pdf:
-                if len(pdf.pages) == 0:
-                    return None
-                
-                pages_to_check = min(sample_pages, len(pdf.pages))
-                common_patterns = {}
-                
-                for i in range(pages_to_check):
-                    page = pdf.pages[i]
-                    text = page.extract_text()
-                    if text:
-                        lines = text.split('\n')
-                        for line in lines:
-                            line = line.strip()
-                            if len(line) > 3:
-                                common_patterns[line] = common_patterns.get(line, 0) + 1
-                
-                if common_patterns:
-                    most_common = max(common_patterns.items(), key=lambda x: x[1])
-                    if most_common[1] >= pages_to_check * 0.7:
-                        return most_common[0]
-                
-                return None
-        except Exception as e:
-            print(f"Warning: Could not auto-detect watermark: {e}", file=sys.stderr)
-            return None
+            if doc.xref_get_key(xref_num, "Subtype")[1] == "/Form":
+                form_xrefs.append(xref_num)
+        except:
+            continue
+    return form_xrefs
+
+
+def update_stream_cached(doc, xref, data, update_mode):
+    """
+    Write data to a stream xref. The compress flag that first works for the document
+    is stored in update_mode["compress"] and used directly for every later stream.
+    """
+    compress = update_mode.get("compress")
+    if compress is not None:
+        doc.update_stream(xref, data, compress=compress)
+        return
+    try:
+        doc.update_stream(xref, data, compress=False)
+        update_mode["compress"] = False
+    except Exception:
+        doc.update_stream(xref, data, compress=True)
+        update_mode["compress"] = True
 
 
-def process_form_xobject(doc, xobj_xref, watermark_lowers, page_num):
+def process_form_xobject(doc, xobj_xref, stream_matcher, page_num, update_mode):
     """Process a form XObject to remove watermark text"""
-    import re
-    
     try:
         # Get XObject stream using xref
         xobj_stream_bytes = doc.xref_stream(xobj_xref)
         if not xobj_stream_bytes:
             return False
         
-        # Decode stream
-        try:
-            xobj_stream_text = xobj_stream_bytes.decode('utf-8', errors='ignore')
-        except:
-            try:
-                xobj_stream_text = xobj_stream_bytes.decode('latin-1', errors='ignore')
-            except:
-                return False
-        
-        original_xobj_stream = xobj_stream_text
-        new_xobj_stream = xobj_stream_text
-        
         # Check if watermark is in this XObject
-        xobj_stream_lower = xobj_stream_text.lower()
-        has_watermark = any(wm_lower in xobj_stream_lower for wm_lower in watermark_lowers)
+        has_watermark = stream_matcher.search(xobj_stream_bytes.lower()) is not None
         
         if not has_watermark:
             return False
         
-        if page_num < 3:
+        if DEBUG and page_num < 3:
             print(f"Debug: Page {page_num + 1} - Found watermark in form XObject (xref {xobj_xref})", file=sys.stderr)
         
-        # Extract text from stream
-        def extract_all_text_from_stream(stream):
-            all_text = []
-            i = 0
-            while i < len(stream):
-                if stream[i] == '(':
-                    j = i + 1
-                    content = []
-                    while j < len(stream):
-                        if stream[j] == '\\' and j + 1 < len(stream):
-                            esc_char = stream[j+1]
-                            if esc_char in '()nrtbf':
-                                content.append(esc_char)
-                            j += 2
-                        elif stream[j] == ')':
-                            all_text.append(''.join(content))
-                            i = j + 1
-                            break
-                        else:
-                            content.append(stream[j])
-                            j += 1
-                    else:
-                        i += 1
-                else:
-                    i += 1
-            
-            hex_matches = re.findall(r'<([0-9A-Fa-f]+)>', stream)
-            for hex_str in hex_matches:
-                try:
-                    if len(hex_str) % 2 == 0:
-                        try:
-                            decoded = bytes.fromhex(hex_str).decode('utf-8', errors='ignore')
-                        except:
-                            decoded = bytes.fromhex(hex_str).decode('latin-1', errors='ignore')
-                        all_text.append(decoded)
-                except:
-                    pass
-            
-            return ' '.join(all_text).lower()
-        
-        # Remove text objects containing watermark
-        text_object_pattern = r'BT(.*?)ET'
-        def should_remove_text_object(match):
-            block = match.group(1)
-            extracted = extract_all_text_from_stream(block)
-            return any(wm_lower in extracted for wm_lower in watermark_lowers)
-        
-        new_xobj_stream = re.sub(text_object_pattern,
-                               lambda m: '' if should_remove_text_object(m) else m.group(0),
-                               new_xobj_stream, flags=re.DOTALL)
-        
-        # Remove inline text operators
-        def should_remove_inline(match):
-            text_str = match.group(1)
-            text_str = text_str.replace('\\\\(', '(').replace('\\\\)', ')')
-            text_str = text_str.replace('\\\\', '\\')
-            return any(wm_lower in text_str.lower() for wm_lower in watermark_lowers)
-        
-        new_xobj_stream = re.sub(r'\(([^)]*)\)\s+Tj\b',
-                               lambda m: '' if should_remove_inline(m) else m.group(0),
-                               new_xobj_stream)
-        
-        def should_remove_tj_array(match):
-            array_content = match.group(1)
-            extracted = extract_all_text_from_stream(array_content)
-            return any(wm_lower in extracted for wm_lower in watermark_lowers)
-        
-        new_xobj_stream = re.sub(r'\[([^\]]*)\]\s+TJ\b',
-                               lambda m: '' if should_remove_tj_array(m) else m.group(0),
-                               new_xobj_stream)
-        
-        new_xobj_stream = re.sub(r'\(([^)]*)\)\s+\'\b',
-                               lambda m: '' if should_remove_inline(m) else m.group(0),
-                               new_xobj_stream)
-        new_xobj_stream = re.sub(r'\(([^)]*)\)\s+"\b',
-                               lambda m: '' if should_remove_inline(m) else m.group(0),
-                               new_xobj_stream)
+        new_xobj_stream = rewrite_content_stream(xobj_stream_bytes, stream_matcher)
         
         # Update XObject stream if modified
-        if new_xobj_stream != original_xobj_stream:
+        if new_xobj_stream != xobj_stream_bytes:
             try:
-                new_stream_bytes = new_xobj_stream.encode('latin-1', errors='ignore')
-                doc.update_stream(xobj_xref, new_stream_bytes, compress=False)
-                if page_num < 3:
+                update_stream_cached(doc, xobj_xref, new_xobj_stream, update_mode)
+                if DEBUG and page_num < 3:
                     print(f"Debug: Page {page_num + 1} - Updated form XObject (xref {xobj_xref})", file=sys.stderr)
                 return True
             except Exception as e:
-                try:
-                    doc.update_stream(xobj_xref, new_stream_bytes, compress=True)
-                    if page_num < 3:
-                        print(f"Debug: Page {page_num + 1} - Updated form XObject (xref {xobj_xref}, compressed)", file=sys.stderr)
-                    return True
-                except Exception as e2:
-                    if page_num < 3:
-                        print(f"Debug: Page {page_num + 1} - Failed to update XObject (xref {xobj_xref}): {e2}", file=sys.stderr)
-                    return False
+                if DEBUG and page_num < 3:
+                    print(f"Debug: Page {page_num + 1} - Failed to update XObject (xref {xobj_xref}): {e}", file=sys.stderr)
+                return False
         
         return False
     except Exception as e:
-        if page_num < 3:
+        if DEBUG and page_num < 3:
             print(f"Debug: Page {page_num + 1} - Error processing XObject: {e}", file=sys.stderr)
         return False
 
 
-def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
+def remove_watermark_pymupdf(pdf_bytes, watermark_matchers, output_path, verify=True, jobs=None):
     """
     Remove watermark using PyMuPDF (fitz) by manipulating content stream.
-    watermark_strings: list of watermark strings to remove, or None
+    pdf_bytes: raw contents of the input PDF
+    watermark_matchers: (text_matcher, stream_matcher) from build_watermark_matchers(), or None
+    verify: re-open the saved output and check that the watermark text is gone
+    jobs: worker processes for the content stream rewrite (default: default_jobs())
     """
-    import re
-    
+    _require_fitz()
     try:
-        doc = fitz.open(pdf_path)
-        watermark_list = watermark_strings if watermark_strings else []
-        watermark_lowers = [w.lower() for w in watermark_list] if watermark_list else []
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        watermark_matcher, stream_matcher = watermark_matchers or (None, None)
+        
+        # Form XObject xrefs, collected on the first watermarked page; streams are read as they are processed
+        form_xrefs = None
+        # Form XObjects are shared between pages, so each one is checked and rewritten at most once
+        processed_xrefs = set()
+        # update_stream compress flag, settled by the first stream written
+        update_mode = {}
+        
+        # Page content streams to rewrite, as (page_num, stream_bytes)
+        pending_streams = []
         
         pages_processed = 0
         for page_num in range(len(doc)):
             page = doc[page_num]
             
-            if not watermark_list:
-                continue
+            if watermark_matcher is None:
+                break
             
-            # First, check if watermark exists on this page
-            page_text = page.get_text().lower()
-            has_watermark = any(wm_lower in page_text for wm_lower in watermark_lowers)
+            # First, check if watermark exists on this page.
+            # Plain text is the cheapest extraction; pages without a hit skip all further work.
+            page_text = page.get_text("text").lower()
+            has_watermark = watermark_matcher.search(page_text) is not None
             if not has_watermark:
                 continue
             
@@ -275,7 +437,7 @@ def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
                     title = annot_info.get("title", "")
                     content_lower = content.lower()
                     title_lower = title.lower()
-                    if any(wm_lower in content_lower or wm_lower in title_lower for wm_lower in watermark_lowers):
+                    if watermark_matcher.search(content_lower) or watermark_matcher.search(title_lower):
                         annots_to_delete.append(annot)
                 except:
                     pass
@@ -286,50 +448,23 @@ def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
                 except:
                     pass
             
-            # Get all text instances using search_for for each watermark string
-            watermark_rects = []
-            for watermark_text in watermark_list:
-                try:
-                    rects = page.search_for(watermark_text)
-                    watermark_rects.extend(rects)
-                except:
-                    pass
-            
-            # Get text blocks to identify watermark locations
-            text_dict = page.get_text("dict")
-            found_watermarks = []
-            
             # Find all text spans containing watermark
-            for block in text_dict.get("blocks", []):
-                if block.get("type") == 0:  # Text block
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            span_text = span.get("text", "")
-                            span_text_lower = span_text.lower()
-                            for wm_lower in watermark_lowers:
-                                if wm_lower in span_text_lower:
-                                    found_watermarks.append(span_text)
-                                    break
-            
-            if found_watermarks and page_num < 5:  # Only print for first few pages
-                print(f"Found watermark text on page {page_num + 1}: {found_watermarks[:3]}...", file=sys.stderr)
+            if DEBUG and page_num < 5:  # Only print for first few pages
+                text_dict = page.get_text("dict")
+                found_watermarks = [span["text"] for block in text_dict.get("blocks", []) if block.get("type") == 0
+                                    for line in block.get("lines", []) for span in line.get("spans", [])
+                                    if watermark_matcher.search(span["text"].lower())]
+                if found_watermarks:
+                    print(f"Found watermark text on page {page_num + 1}: {found_watermarks[:3]}...", file=sys.stderr)
             
             # Remove watermark using text search and direct content stream manipulation
             try:
-                # Clean contents first to normalize
-                page.clean_contents()
-                
-                # Get all text instances of watermark using search_for
-                all_watermark_instances = []
-                for watermark_text in watermark_list:
-                    try:
-                        instances = page.search_for(watermark_text, flags=fitz.TEXT_DEHYPHENATE)
-                        all_watermark_instances.extend(instances)
-                    except:
-                        pass
-                
-                if not all_watermark_instances:
-                    continue
+                # Merge split /Contents into one stream so the rewrite can replace it in place.
+                # Content arrays may share streams with other pages, so they are never blanked directly.
+                # Single-stream pages are scanned as written; string escapes such as \105 are
+                # decoded by decode_literal_string rather than normalized by a clean pass.
+                if len(page.get_contents()) > 1:
+                    page.clean_contents()
                 
                 # Get content stream
                 try:
@@ -339,22 +474,9 @@ def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
                 except:
                     continue
                 
-                # Decode content stream
-                try:
-                    stream_text = stream_bytes.decode('utf-8', errors='ignore')
-                except:
-                    try:
-                        stream_text = stream_bytes.decode('latin-1', errors='ignore')
-                    except:
-                        continue
-                
-                original_stream = stream_text
-                new_stream_text = stream_text
-                
                 # Verify watermark text exists in stream (for debugging)
-                if page_num < 3:
-                    stream_text_lower = stream_text.lower()
-                    found_in_stream = any(wm_lower in stream_text_lower for wm_lower in watermark_lowers)
+                if DEBUG and page_num < 3:
+                    found_in_stream = stream_matcher.search(stream_bytes.lower()) is not None
                     if found_in_stream:
                         print(f"Debug: Page {page_num + 1} - Watermark found in content stream", file=sys.stderr)
                     else:
@@ -363,234 +485,88 @@ def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
                 # Handle form XObjects - watermark is likely here
                 # Process all form XObjects referenced by this page
                 try:
-                    # Get page's XObject resources
-                    xobjects_found = False
                     try:
-                        # Access page dictionary to get resources
-                        page_dict = page.get_contents()
-                        
-                        # Try to get XObjects from page
-                        # Method: Iterate through all XObjects in document and check if they're used by this page
-                        # Get all XObjects from document
-                        for xref_num in range(1, doc.xref_length()):
-                            try:
-                                xref_type = doc.xref_get_key(xref_num, "Type")
-                                if xref_type[1] == "/XObject":
-                                    subtype = doc.xref_get_key(xref_num, "Subtype")
-                                    if subtype[1] == "/Form":
-                                        # This is a form XObject
-                                        try:
-                                            # Check if this XObject contains watermark
-                                            stream_bytes = doc.xref_stream(xref_num)
-                                            if stream_bytes:
-                                                try:
-                                                    xobj_text = stream_bytes.decode('latin-1', errors='ignore').lower()
-                                                    if any(wm_lower in xobj_text for wm_lower in watermark_lowers):
-                                                        # Process this XObject
-                                                        if process_form_xobject(doc, xref_num, watermark_lowers, page_num):
-                                                            xobjects_found = True
-                                                except:
-                                                    pass
-                                        except:
-                                            pass
-                            except:
+                        if form_xrefs is None:
+                            form_xrefs = collect_form_xrefs(doc)
+                        for xref_num in form_xrefs:
+                            if xref_num in processed_xrefs:
                                 continue
-                        
-                        # Alternative: Get XObjects from page resources directly
-                        try:
-                            # Get page object
-                            page_obj = doc[page_num]
-                            # Try to access resources/XObject
-                            # This is complex, so we'll use the document-wide search above
-                            pass
-                        except:
-                            pass
-                            
+                            processed_xrefs.add(xref_num)
+                            # Reads the XObject and rewrites it only if it contains the watermark
+                            process_form_xobject(doc, xref_num, stream_matcher, page_num, update_mode)
                     except Exception as xobj_error:
-                        if page_num < 3:
+                        if DEBUG and page_num < 3:
                             print(f"Debug: Page {page_num + 1} - XObject processing error: {xobj_error}", file=sys.stderr)
                     
-                    # Also try processing XObjects by parsing the content stream for /Do operators
-                    try:
+                    # Also report XObjects referenced from the content stream for /Do operators
+                    if DEBUG and page_num < 3:
                         # Find all XObject references in content stream: /XName Do
-                        do_pattern = r'/(\w+)\s+Do\b'
-                        xobj_refs = re.findall(do_pattern, stream_text)
-                        
-                        if xobj_refs and page_num < 3:
-                            print(f"Debug: Page {page_num + 1} - Found XObject references: {xobj_refs[:3]}", file=sys.stderr)
-                    except:
-                        pass
-                        
+                        xobj_refs = _DO_OPERATOR.findall(stream_bytes)
+                        if xobj_refs:
+                            print(f"Debug: Page {page_num + 1} - Found XObject references: {[ref.decode('latin-1') for ref in xobj_refs[:3]]}", file=sys.stderr)
+                
                 except Exception as xobj_error:
-                    if page_num < 3:
+                    if DEBUG and page_num < 3:
                         print(f"Debug: Page {page_num + 1} - Error accessing XObjects: {xobj_error}", file=sys.stderr)
                     pass
                 
-                # Extract text from PDF content stream more comprehensively
-                def extract_all_text_from_stream(stream):
-                    """Extract all readable text from PDF content stream"""
-                    all_text = []
-                    
-                    # Extract literal strings: (text)
-                    # Handle escaped characters properly
-                    i = 0
-                    while i < len(stream):
-                        if stream[i] == '(':
-                            j = i + 1
-                            content = []
-                            while j < len(stream):
-                                if stream[j] == '\\' and j + 1 < len(stream):
-                                    # Escape sequence
-                                    esc_char = stream[j+1]
-                                    if esc_char in '()nrtbf':
-                                        content.append(esc_char)
-                                    j += 2
-                                elif stream[j] == ')':
-                                    all_text.append(''.join(content))
-                                    i = j + 1
-                                    break
-                                else:
-                                    content.append(stream[j])
-                                    j += 1
-                            else:
-                                i += 1
-                        else:
-                            i += 1
-                    
-                    # Extract hex strings: <hex>
-                    hex_matches = re.findall(r'<([0-9A-Fa-f]+)>', stream)
-                    for hex_str in hex_matches:
-                        try:
-                            if len(hex_str) % 2 == 0:
-                                try:
-                                    decoded = bytes.fromhex(hex_str).decode('utf-8', errors='ignore')
-                                except:
-                                    decoded = bytes.fromhex(hex_str).decode('latin-1', errors='ignore')
-                                all_text.append(decoded)
-                        except:
-                            pass
-                    
-                    return ' '.join(all_text).lower()
-                
-                # More aggressive removal: remove any text object containing watermark
-                # Pattern 1: BT...ET blocks
-                text_object_pattern = r'BT(.*?)ET'
-                
-                def should_remove_text_object(match):
-                    block = match.group(1)
-                    extracted = extract_all_text_from_stream(block)
-                    return any(wm_lower in extracted for wm_lower in watermark_lowers)
-                
-                new_stream_text = re.sub(text_object_pattern,
-                                       lambda m: '' if should_remove_text_object(m) else m.group(0),
-                                       new_stream_text, flags=re.DOTALL)
-                
-                # Pattern 2: Inline text operators
-                def should_remove_inline(match):
-                    text_str = match.group(1)
-                    # Unescape the text
-                    text_str = text_str.replace('\\\\(', '(').replace('\\\\)', ')')
-                    text_str = text_str.replace('\\\\', '\\')
-                    return any(wm_lower in text_str.lower() for wm_lower in watermark_lowers)
-                
-                # Remove (text) Tj
-                new_stream_text = re.sub(r'\(([^)]*)\)\s+Tj\b',
-                                       lambda m: '' if should_remove_inline(m) else m.group(0),
-                                       new_stream_text)
-                
-                # Remove [array] TJ
-                def should_remove_tj_array(match):
-                    array_content = match.group(1)
-                    extracted = extract_all_text_from_stream(array_content)
-                    return any(wm_lower in extracted for wm_lower in watermark_lowers)
-                
-                new_stream_text = re.sub(r'\[([^\]]*)\]\s+TJ\b',
-                                       lambda m: '' if should_remove_tj_array(m) else m.group(0),
-                                       new_stream_text)
-                
-                # Remove (text) ' and (text) "
-                new_stream_text = re.sub(r'\(([^)]*)\)\s+\'\b',
-                                       lambda m: '' if should_remove_inline(m) else m.group(0),
-                                       new_stream_text)
-                new_stream_text = re.sub(r'\(([^)]*)\)\s+"\b',
-                                       lambda m: '' if should_remove_inline(m) else m.group(0),
-                                       new_stream_text)
-                
+                pending_streams.append((page_num, stream_bytes))
+            
+            except Exception as stream_error:
+                if DEBUG and page_num < 3:  # Debug first few pages
+                    print(f"Debug: Stream error on page {page_num + 1}: {stream_error}", file=sys.stderr)
+                pass
+        
+        # The rewrite itself only touches bytes, so it runs as one batch after the page scan
+        rewritten_streams = rewrite_content_streams([stream for _, stream in pending_streams], stream_matcher,
+                                                    jobs or default_jobs())
+        
+        for (page_num, original_stream), new_stream in zip(pending_streams, rewritten_streams):
+            page = doc[page_num]
+            try:
                 # Update content stream if modified
-                if new_stream_text != original_stream:
-                    changes_made = len(original_stream) - len(new_stream_text)
-                    if page_num < 3:  # Debug first few pages
+                if new_stream != original_stream:
+                    changes_made = len(original_stream) - len(new_stream)
+                    if DEBUG and page_num < 3:  # Debug first few pages
                         print(f"Debug: Page {page_num + 1} - Stream modified, removed {changes_made} bytes", file=sys.stderr)
                     
                     try:
                         # Get content xrefs
                         content_xrefs = page.get_contents()
                         if content_xrefs:
-                            # Write modified stream
-                            new_stream_bytes = new_stream_text.encode('latin-1', errors='ignore')
-                            
-                            # Method 1: Try updating without compression
-                            success = False
-                            try:
-                                doc.update_stream(content_xrefs[0], new_stream_bytes, compress=False)
-                                success = True
-                                if page_num < 3:
-                                    print(f"Debug: Page {page_num + 1} - Stream updated (no compression)", file=sys.stderr)
-                            except Exception as e1:
-                                # Method 2: Try with compression
-                                try:
-                                    doc.update_stream(content_xrefs[0], new_stream_bytes, compress=True)
-                                    success = True
-                                    if page_num < 3:
-                                        print(f"Debug: Page {page_num + 1} - Stream updated (compressed)", file=sys.stderr)
-                                except Exception as e2:
-                                    # Method 3: Try alternative update
-                                    try:
-                                        # Use update_stream without compress parameter
-                                        doc.update_stream(content_xrefs[0], new_stream_bytes)
-                                        success = True
-                                        if page_num < 3:
-                                            print(f"Debug: Page {page_num + 1} - Stream updated (default)", file=sys.stderr)
-                                    except Exception as e3:
-                                        if page_num < 3:
-                                            print(f"Debug: Page {page_num + 1} - All update methods failed: {e3}", file=sys.stderr)
-                            
-                            # Force page refresh if update succeeded
-                            if success:
-                                try:
-                                    # Invalidate page cache
-                                    page.clean_contents()
-                                except:
-                                    pass
+                            update_stream_cached(doc, content_xrefs[0], new_stream, update_mode)
+                            if DEBUG and page_num < 3:
+                                print(f"Debug: Page {page_num + 1} - Stream updated (compress={update_mode['compress']})", file=sys.stderr)
                     except Exception as update_error:
-                        if page_num < 3:
+                        if DEBUG and page_num < 3:
                             print(f"Debug: Update error on page {page_num + 1}: {update_error}", file=sys.stderr)
                         pass
                 else:
-                    if page_num < 3:
+                    if DEBUG and page_num < 3:
                         print(f"Debug: Page {page_num + 1} - No changes detected in stream", file=sys.stderr)
-                        
+            
             except Exception as stream_error:
-                if page_num < 3:  # Debug first few pages
+                if DEBUG and page_num < 3:  # Debug first few pages
                     print(f"Debug: Stream error on page {page_num + 1}: {stream_error}", file=sys.stderr)
                 pass
-        
-        doc.save(output_path, garbage=4, deflate=True)
+        write_atomically(output_path, lambda tmp_path: doc.save(
+            tmp_path, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, clean=True))
         
         # Verify watermark removal
-        if watermark_list:
+        if verify and watermark_matcher is not None:
             verify_doc = fitz.open(output_path)
             remaining_watermarks = []
-            for page_num in range(len(verify_doc)):
-                page = verify_doc[page_num]
-                page_text = page.get_text().lower()
-                for wm_lower in watermark_lowers:
-                    if wm_lower in page_text:
-                        remaining_watermarks.append((page_num + 1, wm_lower))
+            for page in verify_doc:
+                hit = watermark_matcher.search(page.get_text().lower())
+                if hit:
+                    remaining_watermarks.append((page.number + 1, hit.group(0)))
+                    if len(remaining_watermarks) >= _VERIFY_MAX_HITS:
+                        break
             verify_doc.close()
             
             if remaining_watermarks:
-                print(f"Warning: Watermark still found on pages: {remaining_watermarks}", file=sys.stderr)
+                more = " (and possibly more)" if len(remaining_watermarks) >= _VERIFY_MAX_HITS else ""
+                print(f"Warning: Watermark still found on pages: {remaining_watermarks}{more}", file=sys.stderr)
                 print("Note: Some watermarks may be embedded as images or in form XObjects.", file=sys.stderr)
             else:
                 print("Watermark removal verified successfully.", file=sys.stderr)
@@ -602,56 +578,11 @@ def remove_watermark_pymupdf(pdf_path, watermark_strings, output_path):
         return False
 
 
-def remove_watermark_pypdf(pdf_path, watermark_strings, output_path):
+@functools.lru_cache(maxsize=None)
+def build_parser():
     """
-    Remove watermark using pypdf (fallback method).
-    Note: This method is less effective as pypdf has limited watermark removal capabilities.
-    watermark_strings: list of watermark strings to remove, or None
+    Build the command-line parser (once per process).
     """
-    try:
-        reader = PdfReader(pdf_path)
-        writer = PdfWriter()
-        
-        watermark_list = watermark_strings if watermark_strings else []
-        watermark_lowers = [w.lower() for w in watermark_list] if watermark_list else []
-        
-        for page in reader.pages:
-            # Try to remove annotations that might contain watermarks
-            if "/Annots" in page:
-                annots = page["/Annots"]
-                if annots:
-                    new_annots = []
-                    for annot_ref in annots:
-                        annot = annot_ref.get_object()
-                        try:
-                            content = annot.get("/Contents", "")
-                            title = annot.get("/T", "")
-                            if watermark_list:
-                                content_lower = str(content).lower()
-                                title_lower = str(title).lower()
-                                if any(wm_lower in content_lower or wm_lower in title_lower for wm_lower in watermark_lowers):
-                                    continue
-                            new_annots.append(annot_ref)
-                        except:
-                            new_annots.append(annot_ref)
-                    
-                    if new_annots:
-                        page["/Annots"] = new_annots
-                    else:
-                        del page["/Annots"]
-            
-            writer.add_page(page)
-        
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        return True
-    except Exception as e:
-        print(f"Error processing PDF: {e}", file=sys.stderr)
-        return False
-
-
-def main():
     parser = argparse.ArgumentParser(
         description='Remove watermarks from PDF files',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -661,13 +592,14 @@ Examples:
   %(prog)s -i document.pdf -rs "CONFIDENTIAL"
   %(prog)s -i document.pdf -rs "test123" "test456"
   %(prog)s -i document.pdf -o output.pdf
+  find scans -name '*.pdf' ! -name '*_remove_watermark.pdf' | %(prog)s --stdin-list -rs "CONFIDENTIAL"
         """
     )
     
     parser.add_argument(
         '-i', '--input',
-        required=True,
-        help='Input PDF file path'
+        default=None,
+        help='Input PDF file path (required unless --stdin-list is given)'
     )
     
     parser.add_argument(
@@ -680,20 +612,51 @@ Examples:
     parser.add_argument(
         '-o', '--output',
         default=None,
-        help='Output PDF file path (default: <input_name>_remove_watermark.pdf)'
+        help='Output PDF file path (default: <input_name>_remove_watermark.pdf in the current directory)'
     )
     
-    args = parser.parse_args()
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=default_jobs(),
+        help='Worker processes for rewriting page content streams; 1 disables the pool (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--no-verify',
+        action='store_true',
+        help='Skip re-reading the output to check that the watermark text is gone'
+    )
+    
+    parser.add_argument(
+        '--stdin-list',
+        action='store_true',
+        help='Read input PDF paths from stdin, one per line, and process them all in this process. Unlike single-file mode, each output is written next to its input as <input_name>_remove_watermark.pdf; inputs already named *_remove_watermark.pdf are skipped, so re-running over the same tree does not process earlier outputs'
+    )
+    
+    parser.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help='Only write the progress log for inputs that fail'
+    )
     
+    return parser
+
+
+def run(args):
+    """
+    Remove watermarks from the single input described by parsed arguments.
+    Returns the process exit status (0 on success).
+    """
     # Validate input file
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"Error: Input file not found: {input_path}", file=sys.stderr)
-        sys.exit(1)
+        return 1
     
     if not input_path.suffix.lower() == '.pdf':
         print(f"Error: Input file must be a PDF: {input_path}", file=sys.stderr)
-        sys.exit(1)
+        return 1
     
     # Determine output path
     if args.output:
@@ -705,40 +668,115 @@ Examples:
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
+    # Read the input once; detection and removal both work from these bytes
+    pdf_bytes = read_pdf_bytes(input_path)
+    
     # Determine watermark text(s)
     watermark_strings = args.remove_string
     
     if not watermark_strings:
         print("Auto-detecting watermark...", file=sys.stderr)
-        detected_watermark = detect_watermark_text(input_path)
+        detected_watermark = detect_watermark_text(pdf_bytes)
         if detected_watermark:
             watermark_strings = [detected_watermark]
             print(f"Detected watermark: '{detected_watermark}'", file=sys.stderr)
         else:
-            print("Warning: Could not auto-detect watermark. Processing without specific watermark text.", file=sys.stderr)
+            print("Warning: Could not auto-detect watermark. Copying input unchanged.", file=sys.stderr)
             print("Note: For best results, specify watermark text with --remove-string", file=sys.stderr)
     
-    if watermark_strings:
-        watermark_display = ', '.join(f"'{w}'" for w in watermark_strings)
-        print(f"Removing watermark(s): {watermark_display}", file=sys.stderr)
+    if not watermark_strings:
+        # Nothing to remove: the output is just the input, so skip the PyMuPDF pass entirely
+        write_atomically(output_path, lambda tmp_path: Path(tmp_path).write_bytes(pdf_bytes))
+        print(f"No watermark to remove. Input copied to: {output_path}")
+        return 0
+    
+    watermark_display = ', '.join(f"'{w}'" for w in watermark_strings)
+    print(f"Removing watermark(s): {watermark_display}", file=sys.stderr)
+    # Compile every watermark into one pattern up front; each page is then scanned once
+    watermark_matchers = build_watermark_matchers(watermark_strings)
     
     # Remove watermark
     print(f"Processing PDF: {input_path}", file=sys.stderr)
     print(f"Output will be saved to: {output_path}", file=sys.stderr)
     
-    # Use appropriate method based on available libraries
-    if PYMUPDF_AVAILABLE:
-        success = remove_watermark_pymupdf(input_path, watermark_strings, output_path)
-    else:
-        print("Warning: Using pypdf (limited watermark removal capabilities).", file=sys.stderr)
-        print("For better results, install PyMuPDF: pip install pymupdf", file=sys.stderr)
-        success = remove_watermark_pypdf(input_path, watermark_strings, output_path)
+    success = remove_watermark_pymupdf(pdf_bytes, watermark_matchers, output_path,
+                                       verify=not args.no_verify, jobs=args.jobs)
     
     if success:
         print(f"Successfully processed PDF. Output saved to: {output_path}")
+        return 0
+    print("Error: Failed to process PDF", file=sys.stderr)
+    return 1
+
+
+def run_logged(args):
+    """
+    Run one input with its stderr messages collected and written in a single write,
+    so the logs of --stdin-list inputs stay in one block each.
+    The stdout result line is held back too and written after the log it concludes.
+    With --quiet the log is only written when the input fails.
+    """
+    log = io.StringIO()
+    result = io.StringIO()
+    status = 1
+    try:
+        with contextlib.redirect_stderr(log), contextlib.redirect_stdout(result):
+            status = run(args)
+    finally:
+        if status or not args.quiet:
+            sys.stderr.write(log.getvalue())
+            sys.stderr.flush()
+        sys.stdout.write(result.getvalue())
+        sys.stdout.flush()
+    return status
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.stdin_list and (args.input or args.output):
+        parser.error("--stdin-list cannot be combined with -i/--input or -o/--output")
+    if not args.stdin_list and not args.input:
+        parser.error("-i/--input is required unless --stdin-list is given")
+    
+    _start_fitz_import()
+    
+    if not args.stdin_list:
+        # A single input has nothing to interleave with; only --quiet needs the log held back
+        status = run_logged(args) if args.quiet else run(args)
     else:
-        print("Error: Failed to process PDF", file=sys.stderr)
-        sys.exit(1)
+        # One process for the whole batch: PyMuPDF, the parser and the worker pool are set up once
+        # Outputs go next to each input so same-named files from different directories don't collide
+        status = 0
+        seen_outputs = set()
+        for line in sys.stdin:
+            # Only the line break is removed; leading or trailing spaces are part of the file name
+            path = line.rstrip('\n')
+            if not path:
+                continue
+            input_path = Path(path)
+            if input_path.name.endswith('_remove_watermark.pdf'):
+                print(f"Skipping {input_path}: already an output of this tool", file=sys.stderr)
+                continue
+            output_path = input_path.parent / f"{input_path.stem}_remove_watermark.pdf"
+            output_key = output_path.resolve()
+            if output_key in seen_outputs:
+                print(f"Error: Output {output_path} was already written in this batch; skipping {input_path}", file=sys.stderr)
+                status = 1
+                continue
+            seen_outputs.add(output_key)
+            # An unreadable input or unwritable output fails that input only, not the rest of the batch
+            try:
+                status |= run_logged(argparse.Namespace(**{**vars(args), 'input': path, 'output': str(output_path)}))
+            except OSError as e:
+                print(f"Error: {input_path}: {e}", file=sys.stderr)
+                status = 1
+    
+    if status:
+        sys.exit(status)
 
 
 if __name__ == '__main__':
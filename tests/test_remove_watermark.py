@@ -0,0 +1,110 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import remove_watermark  # noqa: E402
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+class DecodeLiteralStringTest(unittest.TestCase):
+
+    def test_plain_string_is_returned_as_is(self):
+        self.assertEqual(remove_watermark.decode_literal_string(b'CONFIDENTIAL'), b'CONFIDENTIAL')
+
+    def test_octal_escapes(self):
+        self.assertEqual(remove_watermark.decode_literal_string(rb'CONFID\105NTIAL'), b'CONFIDENTIAL')
+        self.assertEqual(remove_watermark.decode_literal_string(rb'\0537'), b'+7')
+        self.assertEqual(remove_watermark.decode_literal_string(rb'\5x'), b'\x05x')
+
+    def test_character_escapes(self):
+        self.assertEqual(remove_watermark.decode_literal_string(rb'a\nb\rc\td\be\ff'), b'a\nb\rc\td\be\ff')
+        self.assertEqual(remove_watermark.decode_literal_string(rb'\(a\)\\'), b'(a)\\')
+
+    def test_unknown_escape_drops_the_backslash(self):
+        self.assertEqual(remove_watermark.decode_literal_string(rb'\q'), b'q')
+
+    def test_line_continuation(self):
+        self.assertEqual(remove_watermark.decode_literal_string(b'CONFI\\\nDENTIAL'), b'CONFIDENTIAL')
+        self.assertEqual(remove_watermark.decode_literal_string(b'CONFI\\\r\nDENTIAL'), b'CONFIDENTIAL')
+        self.assertEqual(remove_watermark.decode_literal_string(b'CONFI\\\rDENTIAL'), b'CONFIDENTIAL')
+
+
+class RewriteEscapedStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stream_matcher = remove_watermark.build_watermark_matchers(["CONFIDENTIAL"])[1]
+
+    def assertWatermarkRemoved(self, watermark_op):
+        stream = (b'q\nBT\n/F1 11 Tf ' + watermark_op + b'\nET\nQ\n'
+                  b'q\nBT\n/F1 11 Tf (Body text) Tj\nET\nQ\n')
+        rewritten = remove_watermark.rewrite_content_stream(stream, self.stream_matcher)
+        self.assertNotIn(watermark_op, rewritten)
+        self.assertIn(b'(Body text) Tj', rewritten)
+
+    def test_octal_escaped_tj(self):
+        self.assertWatermarkRemoved(rb'(CONFID\105NTIAL) Tj')
+
+    def test_octal_escaped_tj_array(self):
+        self.assertWatermarkRemoved(rb'[(CONFID\105NTIAL)] TJ')
+
+    def test_line_continuation_tj(self):
+        self.assertWatermarkRemoved(b'(CONFI\\\nDENTIAL) Tj')
+
+
+
+def make_single_stream_pdf(watermark_op, pages=3):
+    """
+    Build a PDF whose pages each have ONE content stream drawing watermark_op
+    (raw content stream syntax) above a line of body text.
+    """
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), "CONFIDENTIAL")
+        page.insert_text((72, 200), f"Body text {page_num}")
+        xrefs = page.get_contents()
+        data = b''.join(doc.xref_stream(xref) for xref in xrefs)
+        data = data.replace(b'[<434f4e464944454e5449414c>]TJ', watermark_op)
+        doc.update_stream(xrefs[0], data)
+        doc.xref_set_key(page.xref, "Contents", f"{xrefs[0]} 0 R")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class RemoveEscapedWatermarkTest(unittest.TestCase):
+
+    def remove(self, watermark_op):
+        pdf_bytes = make_single_stream_pdf(watermark_op)
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            self.assertEqual(len(doc[0].get_contents()), 1)
+            self.assertIn("CONFIDENTIAL", doc[0].get_text())
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = Path(tmp_dir) / "out.pdf"
+            matchers = remove_watermark.build_watermark_matchers(["CONFIDENTIAL"])
+            self.assertTrue(remove_watermark.remove_watermark_pymupdf(
+                pdf_bytes, matchers, output_path, verify=False, jobs=1))
+            with fitz.open(output_path) as doc:
+                return [page.get_text() for page in doc]
+
+    def test_octal_escaped_watermark_on_single_stream_page(self):
+        for page_num, text in enumerate(self.remove(rb'(CONFID\105NTIAL) Tj')):
+            self.assertNotIn("CONFIDENTIAL", text)
+            self.assertIn(f"Body text {page_num}", text)
+
+    def test_octal_escaped_watermark_in_tj_array(self):
+        for text in self.remove(rb'[(\103ONFIDENTIAL)] TJ'):
+            self.assertNotIn("CONFIDENTIAL", text)
+
+
+if __name__ == '__main__':
+    unittest.main()